@@ -16,4 +16,31 @@ CHAT_MESSAGES_TABLE = os.getenv("CHAT_MESSAGES_TABLE", "forum_chat_messages")
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+# WebSocket Configuration
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "1000"))  # Pod-wide cap
+WS_HEARTBEAT_INTERVAL_SECONDS = int(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "20"))
+WS_IDLE_TIMEOUT_SECONDS = int(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "60"))
+WS_MAX_BUFFERED_BYTES = int(os.getenv("WS_MAX_BUFFERED_BYTES", "262144"))  # Per connection
+WS_SEND_TIMEOUT_SECONDS = int(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+WS_MAX_MESSAGE_BYTES = int(os.getenv("WS_MAX_MESSAGE_BYTES", "8192"))  # Inbound chat message limit, well below the buffer cap
+
+# Chat message retention
+CHAT_MESSAGE_TTL_DAYS = int(os.getenv("CHAT_MESSAGE_TTL_DAYS", "0"))  # DynamoDB TTL safety net, 0 disables
+CHAT_ARCHIVE_AFTER_DAYS = int(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "7"))  # Checked at startup to be below the TTL
+# The archiver runs as its own CronJob (python -m handlers.archive); API pods refuse to start with this set
+CHAT_ARCHIVE_ENABLED = os.getenv("CHAT_ARCHIVE_ENABLED", "false").lower() == "true"
+CHAT_ARCHIVE_SEGMENT_MAX_MESSAGES = int(os.getenv("CHAT_ARCHIVE_SEGMENT_MAX_MESSAGES", "10000"))
+CHAT_ARCHIVE_BUCKET = os.getenv("CHAT_ARCHIVE_BUCKET", "")  # S3 segment store, required when archiving
+CHAT_ARCHIVE_PREFIX = os.getenv("CHAT_ARCHIVE_PREFIX", "chat-archive/")
+# Local segment store for single-process development only; pod filesystems are ephemeral
+CHAT_ARCHIVE_LOCAL_DEV = os.getenv("CHAT_ARCHIVE_LOCAL_DEV", "false").lower() == "true"
+CHAT_ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "./archive")
+
+# Hot-table scans are paged and paced to leave read capacity for live chat.
+# Limit applies before the time filter, so every scan reads the whole table.
+CHAT_EXPORT_SCAN_PAGE_SIZE = int(os.getenv("CHAT_EXPORT_SCAN_PAGE_SIZE", "100"))
+CHAT_EXPORT_SCAN_PAGE_DELAY_SECONDS = float(os.getenv("CHAT_EXPORT_SCAN_PAGE_DELAY_SECONDS", "0.05"))
+CHAT_ARCHIVE_SCAN_PAGE_SIZE = int(os.getenv("CHAT_ARCHIVE_SCAN_PAGE_SIZE", "25"))
+CHAT_ARCHIVE_SCAN_PAGE_DELAY_SECONDS = float(os.getenv("CHAT_ARCHIVE_SCAN_PAGE_DELAY_SECONDS", "0.2"))
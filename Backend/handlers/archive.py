@@ -0,0 +1,320 @@
+"""
+Chat message archiver: moves aged messages out of DynamoDB into compressed,
+time-ordered NDJSON segments and streams them back for export.
+
+The archiver runs as a single-instance CronJob: python -m handlers.archive
+"""
+import boto3
+from botocore.exceptions import ClientError
+from typing import Optional, List, Iterator, IO, Tuple, Callable
+from datetime import datetime, timedelta
+import fcntl
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+from config import (
+    AWS_REGION, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, CHAT_MESSAGE_TTL_DAYS,
+    CHAT_ARCHIVE_ENABLED, CHAT_ARCHIVE_AFTER_DAYS, CHAT_ARCHIVE_SEGMENT_MAX_MESSAGES,
+    CHAT_ARCHIVE_BUCKET, CHAT_ARCHIVE_PREFIX, CHAT_ARCHIVE_LOCAL_DEV, CHAT_ARCHIVE_DIR,
+    CHAT_ARCHIVE_SCAN_PAGE_SIZE, CHAT_ARCHIVE_SCAN_PAGE_DELAY_SECONDS
+)
+from schemas.models import ChatMessage
+from handlers.database import DynamoDBClient
+
+INDEX_KEY = "index.json"
+INDEX_UPDATE_ATTEMPTS = 5
+
+class LocalArchiveStore:
+    """
+    Segment store backed by a local directory.
+
+    Development only: the directory belongs to a single process, so in a pod it
+    is lost on restart and invisible to other replicas.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, "segments"), exist_ok=True)
+
+    def put_file(self, key: str, path: str):
+        """Store a finished file under key (atomic replace)"""
+        dest = os.path.join(self.root, key)
+        shutil.copyfile(path, dest + ".tmp")
+        os.replace(dest + ".tmp", dest)
+
+    def open(self, key: str) -> Optional[IO[bytes]]:
+        """Open a stored object for reading, or None if missing"""
+        try:
+            return open(os.path.join(self.root, key), "rb")
+        except FileNotFoundError:
+            return None
+
+    def read_versioned(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Read a small object with a version tag for put_if_version"""
+        body = self.open(key)
+        if body is None:
+            return None, None
+        with body:
+            data = body.read()
+        return data, hashlib.md5(data).hexdigest()
+
+    def put_if_version(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        """Write data only if the object still has version (None: must not exist)"""
+        with open(os.path.join(self.root, key + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.read_versioned(key)[1] != version:
+                return False
+            dest = os.path.join(self.root, key)
+            with open(dest + ".tmp", "wb") as tmp:
+                tmp.write(data)
+            os.replace(dest + ".tmp", dest)
+            return True
+
+class S3ArchiveStore:
+    """Segment store backed by an S3 bucket"""
+    def __init__(self, bucket: str, prefix: str):
+        session_config = {'region_name': AWS_REGION}
+        if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
+            session_config['aws_access_key_id'] = AWS_ACCESS_KEY_ID
+            session_config['aws_secret_access_key'] = AWS_SECRET_ACCESS_KEY
+        self.s3 = boto3.client('s3', **session_config)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def put_file(self, key: str, path: str):
+        """Upload a finished file under key"""
+        self.s3.upload_file(path, self.bucket, self.prefix + key)
+
+    def open(self, key: str) -> Optional[IO[bytes]]:
+        """Open a stored object as a streaming body, or None if missing"""
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def read_versioned(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Read a small object with its ETag for put_if_version"""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None, None
+            raise
+        with response['Body'] as body:
+            return body.read(), response['ETag']
+
+    def put_if_version(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        """Conditional put: If-Match on the ETag, or If-None-Match when the object must not exist"""
+        condition = {'IfMatch': version} if version is not None else {'IfNoneMatch': '*'}
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data, **condition)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                return False
+            raise
+
+class ChatArchive:
+    """
+    Time-ordered archive of chat messages.
+
+    Each segment is a gzip-compressed NDJSON file sorted by timestamp. A small
+    index.json lists every segment with its time range and message count so
+    readers can skip segments outside a requested window. A segment stays
+    marked pending until its messages are deleted from the hot table, so an
+    interrupted archiver run can finish the deletes instead of re-archiving.
+    """
+    def __init__(self, store):
+        self.store = store
+
+    def read_index(self) -> List[dict]:
+        """Load the segment index"""
+        body = self.store.open(INDEX_KEY)
+        if body is None:
+            return []
+        try:
+            return json.loads(body.read())['segments']
+        finally:
+            body.close()
+
+    def _update_index(self, mutate: Callable[[List[dict]], List[dict]]):
+        """Apply mutate to the index with a conditional write, retrying on concurrent updates"""
+        for _ in range(INDEX_UPDATE_ATTEMPTS):
+            data, version = self.store.read_versioned(INDEX_KEY)
+            segments = json.loads(data)['segments'] if data is not None else []
+            updated = json.dumps({'segments': mutate(segments)}).encode('utf-8')
+            if self.store.put_if_version(INDEX_KEY, updated, version):
+                return
+        raise RuntimeError(f"Could not update {INDEX_KEY} after {INDEX_UPDATE_ATTEMPTS} attempts")
+
+    def write_segment(self, messages: List[ChatMessage]) -> dict:
+        """Write messages as a new sorted, compressed segment and record it in the index as pending"""
+        messages = sorted(messages, key=lambda m: m.timestamp)
+        start = messages[0].timestamp.timestamp()
+        end = messages[-1].timestamp.timestamp()
+        key = f"segments/{int(start)}-{int(end)}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+
+        with tempfile.NamedTemporaryFile(suffix=".ndjson.gz", delete=False) as tmp:
+            with gzip.GzipFile(fileobj=tmp, mode="wb") as gz:
+                for message in messages:
+                    gz.write(message.model_dump_json().encode('utf-8') + b"\n")
+        try:
+            self.store.put_file(key, tmp.name)
+        finally:
+            os.unlink(tmp.name)
+
+        entry = {'key': key, 'start': start, 'end': end, 'count': len(messages), 'pending': True}
+        self._update_index(lambda segments: sorted(segments + [entry], key=lambda s: s['start']))
+        return entry
+
+    def mark_committed(self, key: str):
+        """Clear the pending flag once a segment's messages are gone from the hot table"""
+        def clear_pending(segments: List[dict]) -> List[dict]:
+            for segment in segments:
+                if segment['key'] == key:
+                    segment.pop('pending', None)
+            return segments
+        self._update_index(clear_pending)
+
+    def pending_segments(self) -> List[dict]:
+        """Segments whose hot-table deletes may not have completed"""
+        return [s for s in self.read_index() if s.get('pending')]
+
+    def segment_message_ids(self, key: str) -> List[str]:
+        """Read the message ids stored in a segment"""
+        body = self.store.open(key)
+        if body is None:
+            return []
+        try:
+            with gzip.GzipFile(fileobj=body, mode="rb") as gz:
+                return [json.loads(line)['message_id'] for line in gz]
+        finally:
+            body.close()
+
+    def _iter_segment(self, key: str) -> Iterator[tuple]:
+        """Yield (timestamp, line) pairs from one segment"""
+        body = self.store.open(key)
+        if body is None:
+            return
+        try:
+            with gzip.GzipFile(fileobj=body, mode="rb") as gz:
+                for line in gz:
+                    record = json.loads(line)
+                    yield datetime.fromisoformat(record['timestamp']).timestamp(), line.rstrip(b"\n")
+        finally:
+            body.close()
+
+    @staticmethod
+    def _overlapping_runs(segments: List[dict]) -> Iterator[List[dict]]:
+        """Group start-sorted segments into runs whose time ranges overlap"""
+        run: List[dict] = []
+        run_end = None
+        for segment in segments:
+            if run and segment['start'] > run_end:
+                yield run
+                run = []
+            run_end = segment['end'] if not run else max(run_end, segment['end'])
+            run.append(segment)
+        if run:
+            yield run
+
+    def iter_ndjson(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[bytes]:
+        """Stream archived messages in timestamp order as NDJSON lines"""
+        segments = [
+            s for s in self.read_index()
+            if (since is None or s['end'] >= since) and (until is None or s['start'] < until)
+        ]
+        # Only overlapping segments (from one archiver run) are open at once; runs are read in order
+        for run in self._overlapping_runs(segments):
+            merged = heapq.merge(*(self._iter_segment(s['key']) for s in run), key=lambda pair: pair[0])
+            for timestamp, line in merged:
+                if since is not None and timestamp < since:
+                    continue
+                if until is not None and timestamp >= until:
+                    return
+                yield line + b"\n"
+
+def archive_aged_messages_sync(db: DynamoDBClient, archive: ChatArchive) -> int:
+    """Move messages older than CHAT_ARCHIVE_AFTER_DAYS into archive segments (synchronous)"""
+    # Finish deletes left over from an interrupted run so those messages are not archived twice
+    for segment in archive.pending_segments():
+        db.delete_messages_sync(archive.segment_message_ids(segment['key']))
+        archive.mark_committed(segment['key'])
+
+    cutoff = (datetime.utcnow() - timedelta(days=CHAT_ARCHIVE_AFTER_DAYS)).timestamp()
+    archived = 0
+    batch: List[ChatMessage] = []
+
+    def flush():
+        nonlocal archived
+        entry = archive.write_segment(batch)
+        # Only delete from the hot table once the segment and index are stored
+        db.delete_messages_sync([m.message_id for m in batch])
+        archive.mark_committed(entry['key'])
+        archived += len(batch)
+        batch.clear()
+
+    messages = db.iter_messages_sync(
+        until=cutoff,
+        page_size=CHAT_ARCHIVE_SCAN_PAGE_SIZE,
+        page_delay=CHAT_ARCHIVE_SCAN_PAGE_DELAY_SECONDS
+    )
+    for message in messages:
+        batch.append(message)
+        if len(batch) >= CHAT_ARCHIVE_SEGMENT_MAX_MESSAGES:
+            flush()
+    if batch:
+        flush()
+    return archived
+
+def _validate_ttl_config():
+    """Refuse a TTL that would expire messages before the archiver moves them"""
+    if CHAT_MESSAGE_TTL_DAYS > 0 and CHAT_ARCHIVE_AFTER_DAYS >= CHAT_MESSAGE_TTL_DAYS:
+        raise RuntimeError(
+            f"CHAT_ARCHIVE_AFTER_DAYS ({CHAT_ARCHIVE_AFTER_DAYS}) must be below "
+            f"CHAT_MESSAGE_TTL_DAYS ({CHAT_MESSAGE_TTL_DAYS})"
+        )
+
+def validate_api_archive_config():
+    """Refuse to start an API pod with retention settings that would lose or duplicate messages"""
+    if CHAT_ARCHIVE_ENABLED:
+        # Every API replica shares one environment, so an in-process archiver would run once per replica
+        raise RuntimeError(
+            "CHAT_ARCHIVE_ENABLED is not supported on API pods; "
+            "run the archiver as a single CronJob (python -m handlers.archive)"
+        )
+    _validate_ttl_config()
+
+def validate_archiver_config():
+    """Refuse to archive into a store that would lose messages"""
+    if not CHAT_ARCHIVE_BUCKET and not CHAT_ARCHIVE_LOCAL_DEV:
+        raise RuntimeError(
+            "The archiver requires CHAT_ARCHIVE_BUCKET "
+            "(set CHAT_ARCHIVE_LOCAL_DEV=true to use a local directory in development)"
+        )
+    _validate_ttl_config()
+
+# Global archive instance
+chat_archive: Optional[ChatArchive] = None
+
+def get_archive() -> Optional[ChatArchive]:
+    """Get archive instance, creating the configured store on first use (None if no store is configured)"""
+    global chat_archive
+    if chat_archive is None:
+        if CHAT_ARCHIVE_BUCKET:
+            chat_archive = ChatArchive(S3ArchiveStore(CHAT_ARCHIVE_BUCKET, CHAT_ARCHIVE_PREFIX))
+        elif CHAT_ARCHIVE_LOCAL_DEV:
+            chat_archive = ChatArchive(LocalArchiveStore(CHAT_ARCHIVE_DIR))
+    return chat_archive
+
+if __name__ == "__main__":
+    validate_archiver_config()
+    archived = archive_aged_messages_sync(DynamoDBClient(), get_archive())
+    print(f"Archived {archived} chat messages")
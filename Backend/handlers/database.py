@@ -2,19 +2,24 @@
 Database initialization and connection management for DynamoDB
 """
 import boto3
+from boto3.dynamodb.conditions import Attr
 from botocore.exceptions import ClientError
-from typing import Optional, List
+from typing import Optional, List, Iterator
 from datetime import datetime
 from decimal import Decimal
 import asyncio
+import time
 from functools import wraps
 
 from config import (
     AWS_REGION, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY,
-    DYNAMODB_ENDPOINT_URL, USERS_TABLE, CHAT_MESSAGES_TABLE
+    DYNAMODB_ENDPOINT_URL, USERS_TABLE, CHAT_MESSAGES_TABLE, CHAT_MESSAGE_TTL_DAYS,
+    CHAT_EXPORT_SCAN_PAGE_SIZE, CHAT_EXPORT_SCAN_PAGE_DELAY_SECONDS
 )
 from schemas.models import User, ChatMessage
 
+SCAN_MAX_BACKOFF_SECONDS = 5.0
+
 def async_wrap(func):
     """Decorator to run sync functions in executor for async compatibility"""
     @wraps(func)
@@ -119,6 +124,19 @@ class DynamoDBClient:
                 # Wait for table to be active
                 waiter = self.client.get_waiter('table_exists')
                 waiter.wait(TableName=CHAT_MESSAGES_TABLE)
+        
+        # Enable TTL on ChatMessages so aged items expire from the hot table
+        if CHAT_MESSAGE_TTL_DAYS > 0:
+            try:
+                ttl = self.client.describe_time_to_live(TableName=CHAT_MESSAGES_TABLE)
+                if ttl['TimeToLiveDescription']['TimeToLiveStatus'] not in ('ENABLED', 'ENABLING'):
+                    self.client.update_time_to_live(
+                        TableName=CHAT_MESSAGES_TABLE,
+                        TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+                    )
+                    print(f"Enabled TTL on table {CHAT_MESSAGES_TABLE}")
+            except ClientError as e:
+                print(f"Error enabling TTL on {CHAT_MESSAGES_TABLE}: {e}")
     
     async def create_tables(self):
         """Create DynamoDB tables if they don't exist (async wrapper)"""
@@ -217,6 +235,55 @@ class DynamoDBClient:
         """Get recent chat messages"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, self._get_recent_messages_sync, limit)
+    
+    def iter_messages_sync(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        page_size: int = CHAT_EXPORT_SCAN_PAGE_SIZE,
+        page_delay: float = CHAT_EXPORT_SCAN_PAGE_DELAY_SECONDS
+    ) -> Iterator[ChatMessage]:
+        """
+        Scan chat messages within [since, until) on timestamp_sort (synchronous).
+
+        Messages come out in table order, not time order. Pages hold page_size
+        items, are paced by page_delay and back off on throttling so bulk scans
+        leave read capacity for live chat. DynamoDB applies Limit before the
+        filter, so even a narrow window reads the whole table.
+        """
+        scan_kwargs = {'Limit': page_size}
+        condition = None
+        if since is not None:
+            condition = Attr('timestamp_sort').gte(Decimal(str(since)))
+        if until is not None:
+            upper = Attr('timestamp_sort').lt(Decimal(str(until)))
+            condition = upper if condition is None else condition & upper
+        if condition is not None:
+            scan_kwargs['FilterExpression'] = condition
+        
+        backoff = page_delay
+        while True:
+            try:
+                response = self.messages_table.scan(**scan_kwargs)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ProvisionedThroughputExceededException':
+                    raise
+                backoff = min(max(backoff * 2, 0.1), SCAN_MAX_BACKOFF_SECONDS)
+                time.sleep(backoff)
+                continue
+            backoff = page_delay
+            for item in response['Items']:
+                yield ChatMessage.from_dynamodb_item(item)
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            time.sleep(page_delay)
+    
+    def delete_messages_sync(self, message_ids: List[str]):
+        """Delete chat messages by id in batches (synchronous)"""
+        with self.messages_table.batch_writer() as batch:
+            for message_id in message_ids:
+                batch.delete_item(Key={'message_id': message_id})
 
 # Global database client instance
 db_client: Optional[DynamoDBClient] = None
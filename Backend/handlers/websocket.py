@@ -1,28 +1,179 @@
 """
 WebSocket connection manager for real-time chat
 """
-from fastapi import WebSocket
-from typing import List
+from fastapi import WebSocket, status
+from typing import Dict, Optional, Set
+import asyncio
+import json
+import time
+
+from config import (
+    WS_MAX_CONNECTIONS, WS_HEARTBEAT_INTERVAL_SECONDS, WS_IDLE_TIMEOUT_SECONDS,
+    WS_MAX_BUFFERED_BYTES, WS_SEND_TIMEOUT_SECONDS
+)
+
+class ConnectionState:
+    """Compact per-connection record (slots keep it small at high connection counts)"""
+    __slots__ = ('websocket', 'username', 'token_expires_at', 'last_seen',
+                 'buffered_bytes', 'queue', 'writer')
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.username: Optional[str] = None
+        self.token_expires_at: Optional[float] = None
+        self.last_seen = time.monotonic()
+        # Bytes queued for this peer but not yet written to its socket
+        self.buffered_bytes = 0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.writer: Optional[asyncio.Task] = None
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Keyed by id() because Starlette's WebSocket is a Mapping and not hashable
+        self.active_connections: Dict[int, ConnectionState] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # Strong references to fire-and-forget close tasks
+        self._closing: Set[asyncio.Task] = set()
 
-    async def connect(self, websocket: WebSocket):
-        """Accept and store a new WebSocket connection"""
+    async def connect(self, websocket: WebSocket) -> bool:
+        """Accept and store a new WebSocket connection, rejecting it when the pod is full"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        if len(self.active_connections) >= WS_MAX_CONNECTIONS:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Server is full")
+            return False
+        state = ConnectionState(websocket)
+        state.writer = asyncio.create_task(self._writer(state))
+        self.active_connections[id(websocket)] = state
+        return True
+
+    def _drop(self, state: ConnectionState):
+        """Remove a connection from the set and stop its writer"""
+        self.active_connections.pop(id(state.websocket), None)
+        # Sentinel wakes the writer even if the cancellation below is swallowed by wait_for
+        state.queue.put_nowait((None, 0))
+        if state.writer is not None and state.writer is not asyncio.current_task():
+            state.writer.cancel()
 
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection"""
-        self.active_connections.remove(websocket)
+        state = self.active_connections.get(id(websocket))
+        if state is not None:
+            self._drop(state)
+
+    def authenticate(self, websocket: WebSocket, username: str, token_expires_at: Optional[float]):
+        """Attach the authenticated user and JWT expiry (unix time) to a connection"""
+        state = self.active_connections.get(id(websocket))
+        if state is not None:
+            state.username = username
+            state.token_expires_at = token_expires_at
+
+    def touch(self, websocket: WebSocket):
+        """Record inbound activity on a connection"""
+        state = self.active_connections.get(id(websocket))
+        if state is not None:
+            state.last_seen = time.monotonic()
+
+    async def _close(self, state: ConnectionState, code: int, reason: str = ""):
+        """Drop a connection from the set and close its socket"""
+        self._drop(state)
+        try:
+            await asyncio.wait_for(state.websocket.close(code=code, reason=reason), WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+    async def _writer(self, state: ConnectionState):
+        """Drain a connection's outbound queue, closing the peer if a send stalls or fails"""
+        while True:
+            text, size = await state.queue.get()
+            if text is None:
+                return
+            try:
+                await asyncio.wait_for(state.websocket.send_text(text), WS_SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                await self._close(state, status.WS_1008_POLICY_VIOLATION, "Send timeout")
+                return
+            except Exception:
+                self._drop(state)
+                return
+            finally:
+                state.buffered_bytes -= size
+
+    def _enqueue(self, state: ConnectionState, text: str) -> bool:
+        """Queue a text frame for a connection, dropping the peer if its backlog exceeds the byte cap"""
+        size = len(text.encode('utf-8'))
+        # An empty queue always accepts a frame, so one large frame cannot drop a peer that is keeping up
+        if state.buffered_bytes > 0 and state.buffered_bytes + size > WS_MAX_BUFFERED_BYTES:
+            # Peer is not draining its socket; drop it instead of growing memory
+            task = asyncio.create_task(self._close(state, status.WS_1008_POLICY_VIOLATION, "Send buffer exceeded"))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            self._drop(state)
+            return False
+        state.buffered_bytes += size
+        state.queue.put_nowait((text, size))
+        return True
+
+    async def send_personal(self, websocket: WebSocket, message: dict) -> bool:
+        """Send a message to a single client"""
+        state = self.active_connections.get(id(websocket))
+        if state is None:
+            return False
+        return self._enqueue(state, json.dumps(message))
 
     async def broadcast(self, message: dict):
         """Broadcast a message to all connected clients"""
-        for connection in self.active_connections:
+        text = json.dumps(message)
+        for state in list(self.active_connections.values()):
+            self._enqueue(state, text)
+
+    async def _heartbeat_once(self):
+        """Reap idle or expired connections and ping the rest"""
+        now = time.monotonic()
+        wall_now = time.time()
+        ping = json.dumps({"type": "ping"})
+        closing = []
+        for state in list(self.active_connections.values()):
+            if state.token_expires_at is not None and wall_now >= state.token_expires_at:
+                closing.append(self._close(state, status.WS_1008_POLICY_VIOLATION, "Token expired"))
+            elif now - state.last_seen > WS_IDLE_TIMEOUT_SECONDS:
+                closing.append(self._close(state, status.WS_1001_GOING_AWAY, "Idle timeout"))
+            else:
+                self._enqueue(state, ping)
+        await asyncio.gather(*closing)
+
+    async def _heartbeat_loop(self):
+        """Run heartbeats every WS_HEARTBEAT_INTERVAL_SECONDS"""
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL_SECONDS)
             try:
-                await connection.send_json(message)
-            except:
+                await self._heartbeat_once()
+                stats = self.stats()
+                print(f"WebSocket connections: {stats['connections']}/{stats['max_connections']}, "
+                      f"buffered bytes: {stats['buffered_bytes']}")
+            except Exception as e:
+                print(f"WebSocket heartbeat error: {e}")
+
+    def start_heartbeat(self):
+        """Start the background heartbeat task"""
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop_heartbeat(self):
+        """Stop the background heartbeat task"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
                 pass
+            self._heartbeat_task = None
+
+    def stats(self) -> dict:
+        """Connection count and bytes currently queued across all connections"""
+        return {
+            "connections": len(self.active_connections),
+            "max_connections": WS_MAX_CONNECTIONS,
+            "buffered_bytes": sum(s.buffered_bytes for s in self.active_connections.values())
+        }
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -6,16 +6,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from handlers.database import init_db
+from handlers.archive import validate_api_archive_config
+from handlers.websocket import manager
 from routes import auth, chat
 
 # Lifespan context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    validate_api_archive_config()
     await init_db()
+    manager.start_heartbeat()
     yield
     # Shutdown
-    pass
+    await manager.stop_heartbeat()
 
 # Create FastAPI app
 app = FastAPI(title="Forum API", lifespan=lifespan)
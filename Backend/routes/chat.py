@@ -2,15 +2,18 @@
 Chat routes: message history and WebSocket real-time chat
 """
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Iterator
+from datetime import datetime
 from jose import JWTError, jwt
 
 from schemas.models import User, ChatMessage
 from schemas.schemas import ChatMessageResponse
 from handlers.auth import get_current_active_user
 from handlers.websocket import manager
+from handlers.archive import get_archive
 from handlers.database import get_db, DynamoDBClient
-from config import SECRET_KEY, ALGORITHM
+from config import SECRET_KEY, ALGORITHM, WS_MAX_MESSAGE_BYTES
 
 router = APIRouter()
 
@@ -32,11 +35,49 @@ async def get_chat_history(
         for msg in messages
     ]
 
+def _export_ndjson(db: DynamoDBClient, since: Optional[float], until: Optional[float]) -> Iterator[bytes]:
+    """
+    Yield archived messages in time order, then hot-table messages as NDJSON lines.
+
+    Hot-table rows are not sorted: they come out in scan order after the archive rows.
+    """
+    archive = get_archive()
+    if archive is not None:
+        yield from archive.iter_ndjson(since, until)
+    for msg in db.iter_messages_sync(since, until):
+        yield msg.model_dump_json().encode('utf-8') + b"\n"
+
+@router.get("/api/chat/export")
+async def export_chat(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Stream the full chat history as NDJSON.
+
+    The hot-table part is a paced full scan (CHAT_EXPORT_SCAN_PAGE_SIZE items every
+    CHAT_EXPORT_SCAN_PAGE_DELAY_SECONDS) even for a narrow since/until window, so
+    large tables keep the response open for minutes.
+    """
+    db = get_db()
+    # A sync generator is iterated in the threadpool, keeping scans and segment reads off the event loop
+    return StreamingResponse(
+        _export_ndjson(
+            db,
+            since.timestamp() if since else None,
+            until.timestamp() if until else None
+        ),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=chat-export.ndjson"}
+    )
+
 @router.websocket("/api/ws/chat")
 async def websocket_chat(websocket: WebSocket):
     """WebSocket endpoint for real-time chat"""
     db = get_db()
-    await manager.connect(websocket)
+    if not await manager.connect(websocket):
+        return
     
     # Authenticate user
     try:
@@ -56,8 +97,11 @@ async def websocket_chat(websocket: WebSocket):
             await websocket.close(code=1008)
             return
         
+        manager.authenticate(websocket, username, payload.get("exp"))
+        manager.touch(websocket)
+        
         # Send welcome message
-        await websocket.send_json({
+        await manager.send_personal(websocket, {
             "type": "system",
             "message": f"Welcome {username}! You are now connected to the chat."
         })
@@ -66,7 +110,7 @@ async def websocket_chat(websocket: WebSocket):
         recent_messages = await db.get_recent_messages(50)
         
         if recent_messages:
-            await websocket.send_json({
+            await manager.send_personal(websocket, {
                 "type": "history",
                 "messages": [
                     {
@@ -81,13 +125,18 @@ async def websocket_chat(websocket: WebSocket):
         # Handle messages
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
             
             # Check for special commands
             if data.startswith("/"):
                 command_parts = data.split(maxsplit=1)
                 command = command_parts[0].lower()
                 
-                if command == "/history":
+                if command == "/pong":
+                    # Heartbeat reply, activity already recorded
+                    continue
+                
+                elif command == "/history":
                     # Get custom number of messages
                     limit = 50
                     if len(command_parts) > 1 and command_parts[1].isdigit():
@@ -96,7 +145,7 @@ async def websocket_chat(websocket: WebSocket):
                     
                     history_messages = await db.get_recent_messages(limit)
                     
-                    await websocket.send_json({
+                    await manager.send_personal(websocket, {
                         "type": "history",
                         "messages": [
                             {
@@ -110,12 +159,20 @@ async def websocket_chat(websocket: WebSocket):
                     continue
                 
                 elif command == "/help":
-                    await websocket.send_json({
+                    await manager.send_personal(websocket, {
                         "type": "system",
                         "message": "Available commands:\n/history [number] - Get recent messages (default 50, max 200)\n/help - Show this help message"
                     })
                     continue
             
+            # Reject oversized messages before they are stored or broadcast
+            if len(data.encode('utf-8')) > WS_MAX_MESSAGE_BYTES:
+                await manager.send_personal(websocket, {
+                    "type": "system",
+                    "message": f"Message too long (max {WS_MAX_MESSAGE_BYTES} bytes)"
+                })
+                continue
+            
             # Regular message - save and broadcast
             chat_message = ChatMessage(username=username, message=data)
             await db.create_message(chat_message)
@@ -130,7 +187,8 @@ async def websocket_chat(websocket: WebSocket):
             await manager.broadcast(message_data)
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
-        manager.disconnect(websocket)
-        print(f"WebSocket error: {e}")
\ No newline at end of file
+        print(f"WebSocket error: {e}")
+    finally:
+        manager.disconnect(websocket)
\ No newline at end of file
@@ -2,11 +2,13 @@
 DynamoDB Models and Data Access Layer
 """
 from pydantic import BaseModel, EmailStr, Field
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List
 from decimal import Decimal
 import uuid
 
+from config import CHAT_MESSAGE_TTL_DAYS
+
 class User(BaseModel):
     username: str
     email: EmailStr
@@ -44,13 +46,17 @@ class ChatMessage(BaseModel):
 
     def to_dynamodb_item(self) -> dict:
         """Convert to DynamoDB item format"""
-        return {
+        item = {
             'message_id': self.message_id,
             'username': self.username,
             'message': self.message,
             'timestamp': self.timestamp.isoformat(),
             'timestamp_sort': Decimal(str(self.timestamp.timestamp()))
         }
+        if CHAT_MESSAGE_TTL_DAYS > 0:
+            # DynamoDB TTL attribute (epoch seconds), expired items are deleted by AWS
+            item['expires_at'] = int((self.timestamp + timedelta(days=CHAT_MESSAGE_TTL_DAYS)).timestamp())
+        return item
 
     @classmethod
     def from_dynamodb_item(cls, item: dict) -> 'ChatMessage':
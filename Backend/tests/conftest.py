@@ -0,0 +1,7 @@
+"""
+Test configuration: make the Backend modules importable as in the container (WORKDIR /app)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,177 @@
+"""
+Tests for the chat archive: segment round trip, export boundaries and ordering, archiver recovery
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from botocore.stub import Stubber
+
+from handlers import archive as archive_module
+from handlers.archive import ChatArchive, LocalArchiveStore, S3ArchiveStore, archive_aged_messages_sync
+from schemas.models import ChatMessage
+
+BASE = datetime(2024, 1, 1)
+
+def message(minutes: int, text: str = None) -> ChatMessage:
+    return ChatMessage(username="alice", message=text or f"m{minutes}", timestamp=BASE + timedelta(minutes=minutes))
+
+def ts(minutes: int) -> float:
+    return (BASE + timedelta(minutes=minutes)).timestamp()
+
+def exported(archive: ChatArchive, since=None, until=None) -> list:
+    return [json.loads(line)['message'] for line in archive.iter_ndjson(since, until)]
+
+class FakeDB:
+    """Stand-in for DynamoDBClient's scan and delete helpers"""
+    def __init__(self, messages):
+        self.messages = {m.message_id: m for m in messages}
+        self.fail_delete = False
+
+    def iter_messages_sync(self, since=None, until=None, page_size=None, page_delay=None):
+        for m in list(self.messages.values()):
+            if until is None or m.timestamp.timestamp() < until:
+                yield m
+
+    def delete_messages_sync(self, message_ids):
+        if self.fail_delete:
+            raise RuntimeError("interrupted")
+        for message_id in message_ids:
+            self.messages.pop(message_id, None)
+
+class CountingStore(LocalArchiveStore):
+    """Local store that tracks how many segment streams are open at once"""
+    def __init__(self, root):
+        super().__init__(root)
+        self.open_streams = 0
+        self.max_open_streams = 0
+
+    def open(self, key):
+        body = super().open(key)
+        if body is None or not key.startswith("segments/"):
+            return body
+        self.open_streams += 1
+        self.max_open_streams = max(self.max_open_streams, self.open_streams)
+        original_close = body.close
+
+        def close():
+            if not body.closed:
+                self.open_streams -= 1
+            original_close()
+        body.close = close
+        return body
+
+@pytest.fixture
+def archive(tmp_path):
+    return ChatArchive(CountingStore(str(tmp_path)))
+
+def test_write_segment_round_trip(archive):
+    entry = archive.write_segment([message(2), message(0), message(1)])
+    assert archive.read_index() == [entry]
+    assert entry['count'] == 3
+    assert (entry['start'], entry['end']) == (ts(0), ts(2))
+    assert exported(archive) == ["m0", "m1", "m2"]
+
+def test_since_until_boundaries(archive):
+    archive.write_segment([message(i) for i in range(5)])
+    # since is inclusive, until is exclusive
+    assert exported(archive, since=ts(1), until=ts(3)) == ["m1", "m2"]
+    assert exported(archive, since=ts(4)) == ["m4"]
+    assert exported(archive, until=ts(0)) == []
+
+def test_overlapping_segments_merge_in_order(archive):
+    archive.write_segment([message(0), message(4), message(8)])
+    archive.write_segment([message(2), message(6)])
+    archive.write_segment([message(20), message(21)])
+    assert exported(archive) == ["m0", "m2", "m4", "m6", "m8", "m20", "m21"]
+
+def test_disjoint_segments_are_read_one_at_a_time(archive):
+    for i in range(5):
+        archive.write_segment([message(10 * i), message(10 * i + 1)])
+    assert len(exported(archive)) == 10
+    assert archive.store.max_open_streams == 1
+    assert archive.store.open_streams == 0
+
+def test_archiver_moves_only_aged_messages(archive):
+    now = datetime.utcnow()
+    old = [ChatMessage(username="bob", message=f"old{i}", timestamp=now - timedelta(days=30, minutes=i)) for i in range(3)]
+    fresh = ChatMessage(username="bob", message="fresh", timestamp=now)
+    db = FakeDB(old + [fresh])
+
+    assert archive_aged_messages_sync(db, archive) == 3
+    assert list(db.messages.values()) == [fresh]
+    assert exported(archive) == ["old2", "old1", "old0"]
+    assert archive.pending_segments() == []
+
+def test_archiver_finishes_interrupted_run_without_duplicates(archive):
+    old = ChatMessage(username="bob", message="old", timestamp=datetime.utcnow() - timedelta(days=30))
+    db = FakeDB([old])
+
+    db.fail_delete = True
+    with pytest.raises(RuntimeError):
+        archive_aged_messages_sync(db, archive)
+    assert len(archive.pending_segments()) == 1
+
+    db.fail_delete = False
+    assert archive_aged_messages_sync(db, archive) == 0
+    assert db.messages == {}
+    assert archive.pending_segments() == []
+    assert exported(archive) == ["old"]
+
+class RacingStore(LocalArchiveStore):
+    """Local store where another writer updates the index between our read and our write"""
+    def __init__(self, root, rival: ChatArchive):
+        super().__init__(root)
+        self.rival = rival
+        self.raced = False
+
+    def read_versioned(self, key):
+        result = super().read_versioned(key)
+        if key == archive_module.INDEX_KEY and not self.raced:
+            self.raced = True
+            self.rival.write_segment([message(100)])
+        return result
+
+def test_concurrent_index_update_is_retried_not_lost(tmp_path):
+    rival = ChatArchive(LocalArchiveStore(str(tmp_path)))
+    archive = ChatArchive(RacingStore(str(tmp_path), rival))
+    archive.write_segment([message(0)])
+    assert archive.store.raced
+    assert len(archive.read_index()) == 2
+    assert exported(archive) == ["m0", "m100"]
+
+def test_s3_index_put_is_conditional():
+    store = S3ArchiveStore("bucket", "prefix/")
+    with Stubber(store.s3) as stub:
+        stub.add_response("put_object", {}, {"Bucket": "bucket", "Key": "prefix/index.json", "Body": b"{}", "IfNoneMatch": "*"})
+        stub.add_client_error("put_object", "PreconditionFailed", http_status_code=412,
+                              expected_params={"Bucket": "bucket", "Key": "prefix/index.json", "Body": b"{}", "IfMatch": '"etag"'})
+        assert store.put_if_version("index.json", b"{}", None) is True
+        assert store.put_if_version("index.json", b"{}", '"etag"') is False
+        stub.assert_no_pending_responses()
+
+def test_api_refuses_in_process_archiver(monkeypatch):
+    monkeypatch.setattr(archive_module, "CHAT_ARCHIVE_ENABLED", True)
+    with pytest.raises(RuntimeError):
+        archive_module.validate_api_archive_config()
+
+    monkeypatch.setattr(archive_module, "CHAT_ARCHIVE_ENABLED", False)
+    archive_module.validate_api_archive_config()
+
+def test_archiver_requires_bucket(monkeypatch):
+    monkeypatch.setattr(archive_module, "CHAT_ARCHIVE_BUCKET", "")
+    monkeypatch.setattr(archive_module, "CHAT_ARCHIVE_LOCAL_DEV", False)
+    with pytest.raises(RuntimeError):
+        archive_module.validate_archiver_config()
+
+    monkeypatch.setattr(archive_module, "CHAT_ARCHIVE_LOCAL_DEV", True)
+    archive_module.validate_archiver_config()
+
+def test_validate_rejects_ttl_not_above_archive_age(monkeypatch):
+    monkeypatch.setattr(archive_module, "CHAT_MESSAGE_TTL_DAYS", 7)
+    monkeypatch.setattr(archive_module, "CHAT_ARCHIVE_AFTER_DAYS", 7)
+    with pytest.raises(RuntimeError):
+        archive_module.validate_api_archive_config()
+
+    monkeypatch.setattr(archive_module, "CHAT_MESSAGE_TTL_DAYS", 0)
+    archive_module.validate_api_archive_config()
@@ -0,0 +1,49 @@
+"""
+Tests for the chat WebSocket route
+"""
+from datetime import timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from handlers.auth import create_access_token
+from routes import chat
+from schemas.models import User
+
+class FakeDB:
+    """Stand-in for DynamoDBClient's user and message operations"""
+    def __init__(self):
+        self.created = []
+
+    async def get_user_by_username(self, username):
+        return User(username=username, email=f"{username}@example.com", hashed_password="x")
+
+    async def get_recent_messages(self, limit=50):
+        return []
+
+    async def create_message(self, message):
+        self.created.append(message)
+        return message
+
+def test_oversized_message_is_rejected_before_storing(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(chat, "get_db", lambda: db)
+    monkeypatch.setattr(chat, "WS_MAX_MESSAGE_BYTES", 10)
+    app = FastAPI()
+    app.include_router(chat.router)
+    token = create_access_token({"sub": "alice"}, timedelta(minutes=5))
+
+    with TestClient(app).websocket_connect("/api/ws/chat") as websocket:
+        websocket.send_text(token)
+        assert websocket.receive_json()["type"] == "system"
+
+        websocket.send_text("x" * 11)
+        reply = websocket.receive_json()
+        assert reply["type"] == "system"
+        assert "too long" in reply["message"]
+
+        websocket.send_text("hello")
+        reply = websocket.receive_json()
+        assert reply["type"] == "message" and reply["message"] == "hello"
+
+    assert [m.message for m in db.created] == ["hello"]
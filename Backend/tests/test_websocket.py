@@ -0,0 +1,155 @@
+"""
+Tests for the WebSocket connection manager: connection cap, reaping and send budgets
+"""
+import asyncio
+import json
+import time
+
+from handlers import websocket as ws_module
+from handlers.websocket import ConnectionManager
+
+class FakeWebSocket:
+    """Minimal stand-in for Starlette's WebSocket"""
+    def __init__(self, stall: bool = False):
+        self.accepted = False
+        self.closed_with = None
+        self.sent = []
+        self.stall = stall
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = (code, reason)
+
+    async def send_text(self, text: str):
+        if self.stall:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(text))
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def drain():
+    """Let writer tasks flush their queues"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+def test_connection_cap_rejects_with_1013(monkeypatch):
+    monkeypatch.setattr(ws_module, "WS_MAX_CONNECTIONS", 1)
+
+    async def scenario():
+        manager = ConnectionManager()
+        first, second = FakeWebSocket(), FakeWebSocket()
+        assert await manager.connect(first) is True
+        assert await manager.connect(second) is False
+        assert second.closed_with[0] == 1013
+        assert len(manager.active_connections) == 1
+        manager.disconnect(first)
+
+    run(scenario())
+
+def test_heartbeat_pings_live_connection():
+    async def scenario():
+        manager = ConnectionManager()
+        socket = FakeWebSocket()
+        await manager.connect(socket)
+        await manager._heartbeat_once()
+        await drain()
+        assert socket.sent == [{"type": "ping"}]
+        assert socket.closed_with is None
+        manager.disconnect(socket)
+
+    run(scenario())
+
+def test_heartbeat_reaps_idle_connection():
+    async def scenario():
+        manager = ConnectionManager()
+        socket = FakeWebSocket()
+        await manager.connect(socket)
+        state = manager.active_connections[id(socket)]
+        state.last_seen = time.monotonic() - ws_module.WS_IDLE_TIMEOUT_SECONDS - 1
+        await manager._heartbeat_once()
+        assert socket.closed_with[0] == 1001
+        assert manager.active_connections == {}
+
+    run(scenario())
+
+def test_heartbeat_reaps_expired_token(monkeypatch):
+    async def scenario():
+        manager = ConnectionManager()
+        socket = FakeWebSocket()
+        await manager.connect(socket)
+        manager.authenticate(socket, "alice", 1000.0)
+        monkeypatch.setattr(ws_module.time, "time", lambda: 1000.0)
+        await manager._heartbeat_once()
+        assert socket.closed_with == (1008, "Token expired")
+        assert manager.active_connections == {}
+
+    run(scenario())
+
+def test_buffer_cap_closes_stalled_peer(monkeypatch):
+    monkeypatch.setattr(ws_module, "WS_MAX_BUFFERED_BYTES", 150)
+
+    async def scenario():
+        manager = ConnectionManager()
+        stalled, healthy = FakeWebSocket(stall=True), FakeWebSocket()
+        await manager.connect(stalled)
+        await manager.connect(healthy)
+        message = {"type": "message", "message": "x" * 30}
+        for _ in range(3):
+            await manager.broadcast(message)
+            await drain()
+        assert stalled.closed_with == (1008, "Send buffer exceeded")
+        assert id(stalled) not in manager.active_connections
+        assert len(healthy.sent) == 3
+        manager.disconnect(healthy)
+
+    run(scenario())
+
+def test_send_timeout_closes_peer_without_blocking_broadcast(monkeypatch):
+    monkeypatch.setattr(ws_module, "WS_SEND_TIMEOUT_SECONDS", 0.01)
+
+    async def scenario():
+        manager = ConnectionManager()
+        stalled = FakeWebSocket(stall=True)
+        await manager.connect(stalled)
+        await asyncio.wait_for(manager.broadcast({"type": "message"}), 0.1)
+        await asyncio.sleep(0.05)
+        assert stalled.closed_with == (1008, "Send timeout")
+        assert manager.active_connections == {}
+
+    run(scenario())
+
+def test_single_large_frame_does_not_drop_healthy_peers(monkeypatch):
+    monkeypatch.setattr(ws_module, "WS_MAX_BUFFERED_BYTES", 1000)
+
+    async def scenario():
+        manager = ConnectionManager()
+        peers = [FakeWebSocket() for _ in range(3)]
+        for peer in peers:
+            await manager.connect(peer)
+        await manager.broadcast({"type": "message", "message": "x" * 3000})
+        await drain()
+        assert len(manager.active_connections) == 3
+        assert all(peer.closed_with is None and len(peer.sent) == 1 for peer in peers)
+        for peer in peers:
+            manager.disconnect(peer)
+
+    run(scenario())
+
+def test_large_personal_reply_is_accepted_on_empty_queue(monkeypatch):
+    monkeypatch.setattr(ws_module, "WS_MAX_BUFFERED_BYTES", 1000)
+
+    async def scenario():
+        manager = ConnectionManager()
+        socket = FakeWebSocket()
+        await manager.connect(socket)
+        history = {"type": "history", "messages": [{"message": "y" * 100}] * 50}
+        assert await manager.send_personal(socket, history) is True
+        await drain()
+        assert socket.sent == [history]
+        assert socket.closed_with is None
+        manager.disconnect(socket)
+
+    run(scenario())
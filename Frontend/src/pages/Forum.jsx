@@ -8,6 +8,12 @@ const WS_URL = 'wss://rybmw.space/api/ws/chat';
 // The single, fixed ID for the main chat thread
 const MAIN_THREAD_ID = 1;
 
+// Delay before reconnecting after the server closes an idle or full connection
+const RECONNECT_DELAY_MS = 3000;
+
+// Keep messages under the server's WS_MAX_MESSAGE_BYTES (8192) even at 4 bytes per character
+const MAX_MESSAGE_LENGTH = 2000;
+
 function Forum() {
   // --- STATE AND HOOKS ---
   const [authState, setAuthState] = useState('loading');
@@ -18,6 +24,7 @@ function Forum() {
   const messagesEndRef = useRef(null); 
   
   const [socket, setSocket] = useState(null);
+  const [reconnectKey, setReconnectKey] = useState(0);
   const [messages, setMessages] = useState([]);
   const [newMessage, setNewMessage] = useState('');
   
@@ -100,6 +107,8 @@ function Forum() {
 
     const token = localStorage.getItem('token');
     const ws = new WebSocket(WS_URL);
+    let reconnectTimer = null;
+    let disposed = false;
     
     ws.onopen = () => {
       console.log('Connected to WebSocket');
@@ -111,7 +120,10 @@ function Forum() {
       try {
         const data = JSON.parse(event.data);
         
-        if (data.type === 'auth_failed') {
+        if (data.type === 'ping') {
+          ws.send('/pong');
+        }
+        else if (data.type === 'auth_failed') {
           console.error("WebSocket Authentication Failed:", data.detail || "Invalid token.");
           setAuthState('unauthenticated');
           ws.close();
@@ -146,15 +158,28 @@ function Forum() {
       }
     };
 
-    ws.onclose = () => {
-      console.log('Disconnected from WebSocket');
-      setSocket(null);
+    ws.onclose = (event) => {
+      console.log('Disconnected from WebSocket', event.code, event.reason);
+      setSocket(current => (current === ws ? null : current));
+      if (disposed) return;
+
+      if (event.code === 1008 && event.reason === 'Token expired') {
+        // Session outlived its JWT; force a fresh login
+        localStorage.removeItem('token');
+        setAuthState('unauthenticated');
+      }
+      else if (event.code === 1001 || event.code === 1013) {
+        // Idle timeout or server full; try again shortly
+        reconnectTimer = setTimeout(() => setReconnectKey(key => key + 1), RECONNECT_DELAY_MS);
+      }
     };
 
     return () => {
+      disposed = true;
+      clearTimeout(reconnectTimer);
       ws.close();
     };
-  }, [authState, user, selectedThread]);
+  }, [authState, user, selectedThread, reconnectKey]);
 
 // ----------------------------------------------------------------------
 // --- MESSAGE SENDING ---
@@ -243,6 +268,7 @@ function Forum() {
               type="text"
               value={newMessage}
               onChange={(e) => setNewMessage(e.target.value)}
+              maxLength={MAX_MESSAGE_LENGTH}
               onKeyPress={(e) => e.key === 'Enter' && sendMessage()}
               placeholder={socket ? "Type your message..." : "Łączenie z czatem..."}
               disabled={!socket}
@@ -30,6 +30,9 @@ resource "kubernetes_config_map" "fastapi_config" {
     "USERS_TABLE"         = "forum_users"
     "CHAT_MESSAGES_TABLE" = "forum_chat_messages"
 
+    # Chat archive segment store
+    "CHAT_ARCHIVE_BUCKET" = aws_s3_bucket.chat_archive.bucket
+
     # JWT Configuration (non-sensitive parts)
     "ACCESS_TOKEN_EXPIRE_MINUTES" = "30"
   }
@@ -0,0 +1,65 @@
+# --- chat-archiver-cronjob ---
+# The archiver must have exactly one instance, so it runs here instead of inside the API replicas.
+resource "kubernetes_cron_job_v1" "chat_archiver" {
+  metadata {
+    name = "chat-archiver"
+    labels = {
+      app = "chat-archiver"
+    }
+  }
+
+  spec {
+    schedule                      = "0 * * * *"
+    concurrency_policy            = "Forbid" # Never start a run while the previous one is still going
+    successful_jobs_history_limit = 1
+    failed_jobs_history_limit     = 3
+
+    job_template {
+      metadata {
+        labels = {
+          app = "chat-archiver"
+        }
+      }
+      spec {
+        backoff_limit = 0
+        template {
+          metadata {
+            labels = {
+              app = "chat-archiver"
+            }
+          }
+          spec {
+            restart_policy = "Never"
+            container {
+              name    = "chat-archiver"
+              image   = "004932907795.dkr.ecr.eu-north-1.amazonaws.com/rybmw/api:latest"
+              command = ["python", "-m", "handlers.archive"]
+
+              env_from {
+                config_map_ref {
+                  name = kubernetes_config_map.fastapi_config.metadata[0].name
+                }
+              }
+              env_from {
+                secret_ref {
+                  name = kubernetes_secret.fastapi_secrets.metadata[0].name
+                }
+              }
+
+              resources {
+                requests = {
+                  cpu    = "100m"
+                  memory = "128Mi"
+                }
+                limits = {
+                  cpu    = "250m"
+                  memory = "512Mi"
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
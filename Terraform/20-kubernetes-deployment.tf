@@ -67,6 +67,15 @@ resource "kubernetes_deployment" "fastapi_deployment" {
               }
             }
           }
+          env {
+            name = "CHAT_ARCHIVE_BUCKET"
+            value_from {
+              config_map_key_ref {
+                name = kubernetes_config_map.fastapi_config.metadata[0].name
+                key  = "CHAT_ARCHIVE_BUCKET"
+              }
+            }
+          }
           env {
             name = "ACCESS_TOKEN_EXPIRE_MINUTES"
             value_from {
@@ -41,6 +41,11 @@ resource "aws_dynamodb_table" "chat_messages" {
     type = "N" # Number
   }
 
+  ttl {
+    attribute_name = "expires_at" # Set by the API, see CHAT_MESSAGE_TTL_DAYS
+    enabled        = true
+  }
+
   global_secondary_index {
     hash_key           = "message_id"
     name               = "timestamp-index"
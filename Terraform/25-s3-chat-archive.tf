@@ -0,0 +1,13 @@
+# --- Chat message archive segments (written by the chat-archiver CronJob, read by /api/chat/export) ---
+resource "aws_s3_bucket" "chat_archive" {
+  bucket = "${local.env}-${local.eks_name}-chat-archive"
+}
+
+resource "aws_s3_bucket_public_access_block" "chat_archive" {
+  bucket = aws_s3_bucket.chat_archive.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}